@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""
+Animations stepping through the years_to_compare.
+
+The complete graph is drawn once, then every frame only shows the data up to
+one more year, without creating any new artist:
+
+    fig, ax = plt.subplots()
+    animation = animations.line_animation(fig, ax, functions.graph_2_variables,
+                                          kind='line', dataframe=df, ...)
+    animations.save_animation(animation, 'pathway.gif')
+"""
+
+import numpy as np
+from matplotlib.animation import FuncAnimation, writers
+from matplotlib.text import Annotation
+
+import functions
+
+
+def line_animation(fig, ax, graph_function, interval=500, **kwargs):
+    """
+
+
+    Parameters
+    ----------
+    fig : Figure
+        FIGURE OF THE ax.
+    ax : axes._axes.Axes
+        AN AXES OBJECT ENCAPSULATES ALL THE ELEMENTS OF AN INDIVIDUAL
+        (SUB-)PLOT IN A FIGURE. SHOULD NOT CONTAIN ANY OTHER DATA.
+    graph_function : function
+        graph_2_variables, graph_3_variables,
+        graph_mulitple_scenarios_2_variables OR
+        graph_mulitple_scenarios_3_variables.
+    interval : float, optional
+        TIME BETWEEN THE FRAMES IN MILLISECONDS. The default is 500.
+    **kwargs
+        ARGUMENTS OF THE graph_function, WITHOUT ax. kind HAS TO BE line.
+
+    Returns
+    -------
+    animation : FuncAnimation
+        ONE FRAME PER YEAR OF years_to_compare, SHOWING THE LINES UP TO THIS
+        YEAR.
+
+    """
+
+    if kwargs.get('kind') != 'line':
+        raise ValueError('Only the line graphs can be animated.')
+
+    # All the frames are prepared and drawn once, with the final axes limits
+    graph_function(ax=ax, **kwargs)
+    years = sorted(int(year) for year in kwargs['years_to_compare'])
+    lines = [(line, np.asarray(line.get_xdata()),
+              np.asarray(line.get_ydata())) for line in ax.lines]
+    markers = [(collection, collection.get_offsets().copy())
+               for collection in ax.collections]
+
+    def update(frame):
+        for line, x, y in lines:
+            shown = x <= years[frame]
+            line.set_data(x[shown], y[shown])
+        for collection, offsets in markers:
+            collection.set_offsets(offsets[offsets[:, 0] <= years[frame]])
+        return [line for line, x, y in lines] + \
+            [collection for collection, offsets in markers]
+
+    return FuncAnimation(fig, update, frames=len(years), interval=interval,
+                         blit=True)
+
+
+def stacked_bar_animation(fig, ax, dataframes, x_var, y_var,
+                          years_to_compare, data_to_compare, data_label_dict,
+                          color_dict, scenario_names, baseline_year,
+                          baseline_name, interval=500, **kwargs):
+    """
+
+
+    Parameters
+    ----------
+    fig : Figure
+        FIGURE OF THE ax.
+    ax : axes._axes.Axes
+        AN AXES OBJECT ENCAPSULATES ALL THE ELEMENTS OF AN INDIVIDUAL
+        (SUB-)PLOT IN A FIGURE. SHOULD NOT CONTAIN ANY OTHER DATA.
+    dataframes, x_var, y_var, years_to_compare, data_to_compare,
+    data_label_dict, color_dict, scenario_names, baseline_year, baseline_name
+        SEE functions.stacked_bar_graph.
+    interval : float, optional
+        TIME BETWEEN THE FRAMES IN MILLISECONDS. The default is 500.
+    **kwargs
+        OTHER OPTIONAL ARGUMENTS OF functions.stacked_bar_graph, EXCEPT
+        collection.
+
+    Returns
+    -------
+    animation : FuncAnimation
+        ONE FRAME PER YEAR OF years_to_compare, SHOWING THE BARS UP TO THIS
+        YEAR.
+
+    """
+
+    if kwargs.get('collection'):
+        raise ValueError('The bars drawn with collection can\'t be animated.')
+
+    # All the bars are drawn once, with the final axes limits
+    df_to_analyze = functions.stacked_bar_graph(
+        ax, dataframes, x_var, y_var, years_to_compare, data_to_compare,
+        data_label_dict, color_dict, scenario_names, baseline_year,
+        baseline_name, **kwargs)
+
+    # Year of every bar, in the same order as the bars of every data
+    year_index = {year: i for i, year in enumerate(years_to_compare)}
+    row_years = np.array([year_index[year] for year in
+                          df_to_analyze.index.get_level_values(x_var)])
+    bars = []
+    for container, data in zip(ax.containers, df_to_analyze.columns):
+        rows = np.flatnonzero(df_to_analyze[data].to_numpy(dtype=float))
+        bars += zip(container.patches, row_years[rows])
+
+    # Year labels and grey lines, the line i is before the cluster i
+    texts = [text for text in ax.texts if not isinstance(text, Annotation)]
+    vlines = [text for text in ax.texts if isinstance(text, Annotation)]
+    labels = list(zip(texts, range(len(texts)))) + \
+        list(zip(vlines, range(1, len(vlines) + 1)))
+
+    def update(frame):
+        for artist, year in bars + labels:
+            artist.set_visible(year <= frame)
+        return [artist for artist, year in bars + labels]
+
+    return FuncAnimation(fig, update, frames=len(years_to_compare),
+                         interval=interval, blit=True)
+
+
+def save_animation(animation, filename, fps=2, dpi=None):
+    """
+    Save the animation as a GIF with Pillow, or in another format (for
+    example MP4) with ffmpeg if it is installed.
+
+    Parameters
+    ----------
+    animation : FuncAnimation
+        ANIMATION FROM line_animation OR stacked_bar_animation.
+    filename : str
+        PATH OF THE FILE. THE EXTENSION GIVES THE FORMAT.
+    fps : float, optional
+        FRAMES PER SECOND. The default is 2.
+    dpi : float, optional
+        RESOLUTION OF THE FRAMES.
+
+    """
+
+    if filename.lower().endswith('.gif'):
+        writer = 'pillow'
+    elif writers.is_available('ffmpeg'):
+        writer = 'ffmpeg'
+    else:
+        raise ValueError('ffmpeg is needed to save ' + filename +
+                         '. Install it or save the animation as a .gif.')
+    animation.save(filename, writer=writer, fps=fps, dpi=dpi)
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Asyncio counterparts of the functions module.
+
+The loading, the preparation of the data and the rendering are run in an
+executor so that they do not block the event loop:
+
+    png = await async_functions.render(functions.graph_2_variables,
+                                       kind='line', dataframe=df, ...)
+
+By default, the executor of the event loop (threads) is used. A
+concurrent.futures.ProcessPoolExecutor can be given instead with executor=,
+the data are then copied to the worker process. Cancelling the task cancels
+the work if it has not started yet; a work already running in a thread is
+completed but its result is ignored.
+"""
+
+import asyncio
+import functools
+
+import functions
+
+
+async def run_in_executor(function, *args, executor=None, **kwargs):
+    """
+    Run function(*args, **kwargs) in the executor without blocking the
+    event loop.
+
+    Parameters
+    ----------
+    function : function
+        FUNCTION TO RUN. HAS TO BE DEFINED AT THE TOP LEVEL OF A MODULE TO BE
+        USED WITH A ProcessPoolExecutor.
+    executor : concurrent.futures.Executor, optional
+        EXECUTOR RUNNING THE FUNCTION. The default is the executor of the
+        event loop.
+
+    Returns
+    -------
+    RESULT OF THE function.
+
+    """
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(function, *args, **kwargs))
+
+
+async def load_gdx(path_to_gdx_file, system_directory=None, executor=None):
+    """
+    Load a GDX file into a Container object, see the README.
+
+    Returns
+    -------
+    data_container : Container object
+        GDX FILE STORED AS A DATA CONTAINER FROM THE TRANSFER MODULE.
+
+    """
+
+    import gams.transfer as gt
+    return await run_in_executor(gt.Container, executor=executor,
+                                 load_from=path_to_gdx_file,
+                                 system_directory=system_directory)
+
+
+async def verification(gdx_files, name, x_var, y_var, years_to_compare,
+                       data_to_compare, z_var=False, z_var_to_compare=False,
+                       executor=None):
+    """
+    Asyncio counterpart of functions.verification.
+
+    Returns
+    -------
+    list of DataFrames or bool
+        SEE functions.verification.
+
+    """
+
+    return await run_in_executor(functions.verification, gdx_files, name,
+                                 x_var, y_var, years_to_compare,
+                                 data_to_compare, z_var, z_var_to_compare,
+                                 executor=executor)
+
+
+async def stacked_bar_data(*args, executor=None, **kwargs):
+    """
+    Asyncio counterpart of functions.stacked_bar_data.
+
+    Returns
+    -------
+    df_to_analyze : DataFrame
+        DataFrame of the graph output.
+    data_to_plot : list of str
+        DATA TO STACK FROM BOTTOM TO TOP.
+
+    """
+
+    return await run_in_executor(functions.stacked_bar_data, *args,
+                                 executor=executor, **kwargs)
+
+
+async def graph_2_variables_data(*args, executor=None, **kwargs):
+    """
+    Asyncio counterpart of functions.graph_2_variables_data.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS.
+
+    """
+
+    return await run_in_executor(functions.graph_2_variables_data,
+                                 *args, executor=executor, **kwargs)
+
+
+async def graph_3_variables_data(*args, executor=None, **kwargs):
+    """
+    Asyncio counterpart of functions.graph_3_variables_data.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS.
+
+    """
+
+    return await run_in_executor(functions.graph_3_variables_data,
+                                 *args, executor=executor, **kwargs)
+
+
+async def graph_mulitple_scenarios_2_variables_data(*args, executor=None,
+                                                    **kwargs):
+    """
+    Asyncio counterpart of
+    functions.graph_mulitple_scenarios_2_variables_data.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS.
+
+    """
+
+    return await run_in_executor(
+        functions.graph_mulitple_scenarios_2_variables_data, *args,
+        executor=executor, **kwargs)
+
+
+async def graph_mulitple_scenarios_3_variables_data(*args, executor=None,
+                                                    **kwargs):
+    """
+    Asyncio counterpart of
+    functions.graph_mulitple_scenarios_3_variables_data.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS.
+
+    """
+
+    return await run_in_executor(
+        functions.graph_mulitple_scenarios_3_variables_data, *args,
+        executor=executor, **kwargs)
+
+
+async def render(graph_function, file_format='png', figsize=None, dpi=None,
+                 executor=None, **kwargs):
+    """
+    Asyncio counterpart of functions.graph_to_bytes. The graph_function is
+    drawn on a new figure and the file is returned.
+
+    Parameters
+    ----------
+    graph_function : function
+        ONE OF THE GRAPH FUNCTIONS OF THE functions MODULE.
+    file_format : str, optional
+        FORMAT OF THE FILE. EITHER png, svg OR pdf. The default is 'png'.
+    figsize : tuple, optional
+        SIZE OF THE FIGURE. THE FORMAT IS (WIDTH, HEIGHT).
+    dpi : float, optional
+        RESOLUTION OF THE FIGURE.
+    executor : concurrent.futures.Executor, optional
+        EXECUTOR RUNNING THE FUNCTION. The default is the executor of the
+        event loop.
+    **kwargs
+        ARGUMENTS OF THE graph_function, WITHOUT ax.
+
+    Returns
+    -------
+    bytes
+        FILE OF THE GRAPH.
+
+    """
+
+    return await run_in_executor(functions.graph_to_bytes, graph_function,
+                                 file_format, figsize, dpi,
+                                 executor=executor, **kwargs)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the plotting functions on large generated DataFrames.
+
+Run with: python benchmark.py
+"""
+
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import functions
+import templates
+
+
+def generated_dataframes(n_scenarios=3, n_years=10, n_data=100, seed=0):
+    """
+    Generate DataFrames in the same format as the records of a GDX file,
+    one per scenario.
+
+    """
+
+    rng = np.random.default_rng(seed)
+    years = [str(2020 + 5*i) for i in range(n_years)]
+    data = ['Data' + str(i) for i in range(n_data)]
+    dataframes = []
+    for i in range(n_scenarios):
+        df = pd.DataFrame({'Year': np.repeat(years, n_data),
+                           'Data': np.tile(data, n_years),
+                           'value': rng.random(n_years*n_data)})
+        dataframes.append(df)
+    return dataframes, years, data
+
+
+def time_savefig(fig, extension):
+    """Time to save fig in a file and size of the file in kB."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'figure.' + extension)
+        start = time.perf_counter()
+        fig.savefig(path)
+        duration = time.perf_counter() - start
+        size = os.path.getsize(path)/1000
+    return duration, size
+
+
+def benchmark_vector_output():
+    """savefig time and file size of the different rendering modes."""
+    dataframes, years, data = generated_dataframes()
+    scenario_names = ['Baseline'] + ['Scenario ' + str(i)
+                                     for i in range(1, len(dataframes))]
+    data_label_dict = {name: name for name in data}
+    color_dict = {name: 'C' + str(i % 10) for i, name in enumerate(data)}
+
+    modes = {'default': {},
+             'collection': {'collection': True},
+             'collection + rasterized': {'collection': True,
+                                         'rasterized': True}}
+    print('stacked_bar_graph')
+    for mode, options in modes.items():
+        fig, ax = plt.subplots()
+        functions.stacked_bar_graph(ax, [df.copy() for df in dataframes],
+                                    'Year', 'Data', years, data,
+                                    data_label_dict, color_dict,
+                                    scenario_names, years[0], 'Baseline',
+                                    **options)
+        for extension in ['svg', 'pdf']:
+            duration, size = time_savefig(fig, extension)
+            print('  {:<24} {:<4} {:8.3f} s {:10.1f} kB'.format(
+                mode, extension, duration, size))
+        plt.close(fig)
+
+    dataframe, years, data = generated_dataframes(n_scenarios=1, n_years=200,
+                                                  n_data=50)
+    dataframe = dataframe[0]
+    marker_dict = {name: 'o' for name in data}
+    print('graph_2_variables with markers')
+    for mode, options in [('default', {}),
+                          ('rasterized', {'rasterized': True})]:
+        fig, ax = plt.subplots()
+        functions.graph_2_variables('line', ax, dataframe, 'Year', 'Data',
+                                    years, data, data_label_dict, color_dict,
+                                    marker_dict=marker_dict, **options)
+        for extension in ['svg', 'pdf']:
+            duration, size = time_savefig(fig, extension)
+            print('  {:<24} {:<4} {:8.3f} s {:10.1f} kB'.format(
+                mode, extension, duration, size))
+        plt.close(fig)
+
+
+def benchmark_figure_template(n_figures=50):
+    """Export time per figure with and without a FigureTemplate."""
+    datasets = [generated_dataframes(n_scenarios=1, n_years=10, n_data=6,
+                                     seed=i) for i in range(n_figures)]
+    years, data = datasets[0][1], datasets[0][2]
+    arguments = {'kind': 'line', 'x_var': 'Year', 'y_var': 'Data',
+                 'years_to_compare': years, 'data_to_compare': data,
+                 'data_label_dict': {name: name for name in data},
+                 'color_dict': {name: 'C' + str(i)
+                                for i, name in enumerate(data)},
+                 'marker_dict': {name: 'o' for name in data}}
+
+    def style(ax):
+        ax.grid(axis='y')
+        ax.set_title('Title')
+        ax.set_ylabel('Value')
+
+    start = time.perf_counter()
+    for dataframes, years, data in datasets:
+        fig, ax = plt.subplots()
+        style(ax)
+        functions.graph_2_variables(ax=ax, dataframe=dataframes[0],
+                                    **arguments)
+        fig.savefig(io.BytesIO(), format='png')
+        plt.close(fig)
+    without_template = (time.perf_counter() - start)/n_figures
+
+    start = time.perf_counter()
+    template = templates.FigureTemplate(functions.graph_2_variables,
+                                        style=style, **arguments)
+    for dataframes, years, data in datasets:
+        template.update(dataframe=dataframes[0])
+        template.savefig(io.BytesIO(), format='png')
+    with_template = (time.perf_counter() - start)/n_figures
+
+    print('graph_2_variables export of ' + str(n_figures) + ' figures')
+    print('  {:<24} {:8.1f} ms per figure'.format('without template',
+                                                   without_template*1000))
+    print('  {:<24} {:8.1f} ms per figure'.format('with template',
+                                                   with_template*1000))
+
+
+def benchmark_memory(n_rows=3000000, max_bytes_per_row=8,
+                     max_selected_ratio=10):
+    """
+    Peak memory of the preparation of a graph from a large symbol. The
+    masks selecting the rows take a few bytes per input row, everything else
+    has to stay within a small multiple of the selected rows.
+
+    """
+
+    rng = np.random.default_rng(0)
+    years = [str(2020 + 5*i) for i in range(7)]
+    technologies = ['Tech' + str(i) for i in range(300)]
+    nodes = ['Node' + str(i) for i in range(50)]
+    df = pd.DataFrame({
+        'Year': pd.Categorical.from_codes(rng.integers(0, 7, n_rows), years),
+        'Tech': pd.Categorical.from_codes(rng.integers(0, 300, n_rows),
+                                          technologies),
+        'Node': pd.Categorical.from_codes(rng.integers(0, 50, n_rows),
+                                          nodes),
+        'level': rng.random(n_rows), 'marginal': rng.random(n_rows),
+        'lower': rng.random(n_rows), 'upper': rng.random(n_rows)})
+    selection = {'Year': years[:3], 'Tech': technologies[:20],
+                 'Node': nodes[:10]}
+    selected = df[np.logical_and.reduce([df[column].isin(values)
+                                         for column, values
+                                         in selection.items()])]
+    selected = selected[list(selection) + ['level']]
+    selected_size = selected.memory_usage(deep=True).sum()
+
+    tracemalloc.start()
+    functions.graph_3_variables_data(df, 'Year', 'Tech', 'Node',
+                                     years[:3], technologies[:20], nodes[:10],
+                                     {name: name for name in technologies},
+                                     {name: name for name in nodes})
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print('graph_3_variables_data peak memory')
+    print('  {:<24} {:10.1f} MB'.format(
+        'input', df.memory_usage(deep=True).sum()/1e6))
+    print('  {:<24} {:10.1f} MB ({} rows)'.format(
+        'selected rows', selected_size/1e6, len(selected)))
+    print('  {:<24} {:10.1f} MB'.format('peak', peak/1e6))
+    bound = max_bytes_per_row*n_rows + max_selected_ratio*selected_size
+    if peak > bound:
+        raise AssertionError('Peak memory {:.1f} MB above {:.1f} MB'.format(
+            peak/1e6, bound/1e6))
+
+
+def benchmark_chunks(n_chunks=20, chunk_rows=500000):
+    """
+    Peak memory of aggregate_chunks on a symbol generated chunk by chunk,
+    which has to depend on the size of a chunk and not on the number of
+    chunks.
+
+    """
+
+    years = [str(2020 + 5*i) for i in range(7)]
+    technologies = ['Tech' + str(i) for i in range(300)]
+    hours = [str(i) for i in range(8760)]
+
+    def chunks():
+        rng = np.random.default_rng(0)
+        for i in range(n_chunks):
+            yield pd.DataFrame({
+                'Year': pd.Categorical.from_codes(
+                    rng.integers(0, 7, chunk_rows), years),
+                'Tech': pd.Categorical.from_codes(
+                    rng.integers(0, 300, chunk_rows), technologies),
+                'Hour': pd.Categorical.from_codes(
+                    rng.integers(0, 8760, chunk_rows), hours),
+                'level': rng.random(chunk_rows)})
+
+    chunk_size = next(chunks()).memory_usage(deep=True).sum()
+    print('aggregate_chunks peak memory')
+    print('  {:<24} {:10.1f} MB ({} rows)'.format(
+        'one chunk', chunk_size/1e6, chunk_rows))
+    for n in [n_chunks//4, n_chunks]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        functions.aggregate_chunks(
+            (chunk for i, chunk in zip(range(n), chunks())),
+            {'Year': years, 'Tech': technologies[:50]}, 'sum')
+        duration = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('  {:<24} {:10.1f} MB {:8.3f} s'.format(
+            str(n*chunk_rows) + ' rows', peak/1e6, duration))
+
+
+if __name__ == '__main__':
+    benchmark_vector_output()
+    benchmark_figure_template()
+    benchmark_memory()
+    benchmark_chunks()
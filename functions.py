@@ -3,9 +3,15 @@
 @author: Frédérik Lavictoire
 """
 
+import io
+
 import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
+from matplotlib.patches import PathPatch
+from matplotlib.path import Path
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
 
 def stacked_bar_graph(ax, dataframes, x_var, y_var,
                       years_to_compare, data_to_compare,
@@ -13,7 +19,8 @@ def stacked_bar_graph(ax, dataframes, x_var, y_var,
                       scenario_names, baseline_year,
                       baseline_name, specific_variable_title=False,
                       specific_variable_name=False, legend_position=False,
-                      year_height=3):
+                      year_height=3, top_k=False, sparse=False,
+                      collection=False, rasterized=False):
     """
 
 
@@ -59,6 +66,23 @@ def stacked_bar_graph(ax, dataframes, x_var, y_var,
     year_height : float, optional
         SPECIFY THIS NUMBER IF YOU WANT THE YEARS TO BE DISPLAYED HIGHER OR
         LOWER.
+    top_k : int, optional
+        USE IF YOU ONLY WANT THE k DATA WITH THE LARGEST TOTAL CONTRIBUTION
+        TO BE DISPLAYED. ALL THE OTHER DATA ARE ADDED TOGETHER IN AN 'Other'
+        BAR ON TOP. THE LABEL AND COLOR OF THIS BAR CAN BE SPECIFIED WITH THE
+        'Other' KEY IN data_label_dict AND color_dict. The default is False.
+    sparse : bool, optional
+        USE IF MOST OF THE DATA ARE ZERO. THE RETURNED DATAFRAME IS THEN
+        STORED WITH SPARSE COLUMNS INSTEAD OF A DENSE TABLE FILLED WITH
+        ZEROS. The default is False.
+    collection : bool, optional
+        USE IF YOU WANT ALL THE BARS OF THE SAME DATA TO BE DRAWN AS A SINGLE
+        OBJECT. MUCH SMALLER AND FASTER TO SAVE IN VECTOR FILES (SVG, PDF).
+        The default is False.
+    rasterized : bool, optional
+        USE IF YOU WANT THE BARS TO BE SAVED AS AN IMAGE IN VECTOR FILES
+        (SVG, PDF). THE AXES AND TEXT STAY IN VECTOR FORMAT.
+        The default is False.
 
     Returns
     -------
@@ -67,89 +91,242 @@ def stacked_bar_graph(ax, dataframes, x_var, y_var,
 
     """
 
-    df_list = []
-    for i, scenarios in enumerate(dataframes):  # For every scenario
-        df = scenarios
-        # Add a mark to identify which scenario it is
-        df['Scenario'] = scenario_names[i]
+    df_to_analyze, data_to_plot = stacked_bar_data(
+        dataframes, x_var, y_var, years_to_compare, data_to_compare,
+        scenario_names, baseline_year, baseline_name,
+        specific_variable_title, specific_variable_name, top_k, sparse)
 
-        # To only show the years and data to compare
-        df = df[df[x_var].isin(years_to_compare)]
-        df = df[df[y_var].isin(data_to_compare)]
+    draw_stacked_bar_graph(ax, df_to_analyze, data_to_plot,
+                           years_to_compare, data_label_dict, color_dict,
+                           scenario_names, legend_position, year_height,
+                           collection=collection, rasterized=rasterized)
 
-        # If we want to look at only one country for example
-        if specific_variable_title and specific_variable_name:
-            df = df.loc[df[specific_variable_title] == specific_variable_name]
+    return df_to_analyze
 
-        # To have only one bar for the baseline year
-        if (scenario_names[i] != baseline_name):
-            df = df.loc[df[x_var] != baseline_year]
 
-        df['plot order'] = i  # To plot the bars in the right order
+def stacked_bar_graph_pages(dataframes, x_var, y_var,
+                            years_to_compare, data_to_compare,
+                            data_label_dict, color_dict,
+                            scenario_names, baseline_year,
+                            baseline_name, years_per_page=4, axes=None,
+                            pdf_file=False, figsize=None,
+                            specific_variable_title=False,
+                            specific_variable_name=False,
+                            legend_position=False, year_height=3,
+                            top_k=False, sparse=False, collection=False,
+                            rasterized=False):
+    """
 
-        if 'value' in df.columns:  # Either 'level' or 'value'
-            df = df.pivot_table(index=[x_var, 'Scenario', 'plot order'],
-                                columns=y_var, values='value')
-        else:
-            df = df.pivot_table(index=[x_var, 'Scenario', 'plot order'],
-                                columns=y_var, values='level')
-        df_list.append(df)
 
-    df_to_analyze = pd.concat(df_list)
-    df_to_analyze = df_to_analyze.fillna(value=0)
-    df_to_analyze = df_to_analyze.sort_values(by=[x_var, 'plot order'])
+    Parameters
+    ----------
+    dataframes : list of DataFrame
+        LIST OF THE DATAFRAMES THAT WILL BE OUTPUT IN THE GRAPH BASED ON
+        DIFFERENT SCENARIOS.
+    x_var : str
+        VARIABLE THAT WILL BE DISPLAYED ON THE X AXIS IN THE GRAPH. USUALLY,
+        THIS VARIABLE IS REPRESENTS YEARS.
+    y_var : str
+        VARIABLE THAT WILL BE DISPLAYED ON THE Y AXIS IN THE GRAPH.
+    years_to_compare : list of str
+        SPECIFIC YEARS TO COMPARE. HAS TO BE RELATED TO x_var.
+    data_to_compare : list of str
+        SPECIFIC DATA TO COMPARE. HAS TO BE RELATED TO y_var. THE ORDER
+        OF THIS LIST WILL DETERMINE THE PLOT ORDER FROM BOTTOM TO TOP.
+    data_label_dict : dict
+        LABELS THAT WE WANT TO BE DISPLAYED IN THE GRAPH BASED ON THE
+        ORIGINAL NAMES IN THE CONTAINER OBJECT.
+    color_dict : dict
+        COLORS THAT WILL BE DISPLAYED BASED ON THE ORIGINAL NAMES IN THE
+        CONTAINER OBJECT.
+    scenario_names : list of str
+        LABELS OF THE DIFFERENT SCENARIOS WE WANT DISPLAYED. NEEDS TO BE IN
+        THE SAME ORDER OF SCENARIOS AS IN THE dataframes list.
+    baseline_year : str
+        BASELINE YEAR FOR THE FIRST BAR IN THE GRAPH.
+    baseline_name : str
+        BASELINE NAME.
+    years_per_page : int, optional
+        NUMBER OF YEARS DISPLAYED ON EACH PAGE. The default is 4.
+    axes : list or array of axes._axes.Axes, optional
+        USE IF YOU WANT THE PAGES TO BE DRAWN ON EXISTING AXES, ONE PAGE PER
+        AXES (FOR EXAMPLE THE axes OF plt.subplots). OTHERWISE, ONE FIGURE IS
+        CREATED PER PAGE.
+    pdf_file : str, optional
+        USE IF YOU WANT THE PAGES TO BE SAVED IN A MULTIPAGE PDF FILE. EVERY
+        FIGURE IS SAVED AND CLOSED BEFORE THE NEXT PAGE IS DRAWN. WITH axes,
+        EVERY FIGURE IS SAVED ONCE ALL ITS PAGES ARE DRAWN.
+    figsize : tuple, optional
+        SIZE OF THE FIGURES CREATED FOR EVERY PAGE. THE FORMAT IS
+        (WIDTH, HEIGHT).
+    specific_variable_title : str, optional
+        VARIABLE THAT WE WANT TO BE DISPLAYED. NARROWS DOWN THE DISPLAYED
+        RESULTS. The default is False.
+    specific_variable_name : str, optional
+        SPECIFIC VARIABLE TO NARROW DOWN THE DISPLAYED RESULTS. HAS TO BE
+        RELATED TO specific_variable_title. The default is False.
+    legend_position : tuple, optional
+        USE IF YOU WANT TO SPECIFY THE LEGEND POSITION. THE FORMAT IS (X,Y).
+    year_height : float, optional
+        SPECIFY THIS NUMBER IF YOU WANT THE YEARS TO BE DISPLAYED HIGHER OR
+        LOWER.
+    top_k : int, optional
+        USE IF YOU ONLY WANT THE k DATA WITH THE LARGEST TOTAL CONTRIBUTION
+        TO BE DISPLAYED. SEE stacked_bar_graph. The default is False.
+    sparse : bool, optional
+        USE IF MOST OF THE DATA ARE ZERO. SEE stacked_bar_graph.
+        The default is False.
+    collection : bool, optional
+        USE IF YOU WANT ALL THE BARS OF THE SAME DATA TO BE DRAWN AS A SINGLE
+        OBJECT. SEE stacked_bar_graph. The default is False.
+    rasterized : bool, optional
+        USE IF YOU WANT THE BARS TO BE SAVED AS AN IMAGE IN VECTOR FILES.
+        SEE stacked_bar_graph. The default is False.
+
+    Returns
+    -------
+    df_to_analyze : DataFrame
+        DataFrame of the graph output, for all the pages.
+    figures : list of Figure
+        FIGURES OF THE DIFFERENT PAGES. EMPTY IF pdf_file IS SPECIFIED
+        WITHOUT axes SINCE THE FIGURES ARE CLOSED ONCE SAVED.
+
+    """
+
+    # The data are prepared once for all the pages
+    df_to_analyze, data_to_plot = stacked_bar_data(
+        dataframes, x_var, y_var, years_to_compare, data_to_compare,
+        scenario_names, baseline_year, baseline_name,
+        specific_variable_title, specific_variable_name, top_k, sparse)
+    ylim = _stacked_bar_ylim(df_to_analyze)
+    years = df_to_analyze.index.get_level_values(x_var)
+
+    pages = [years_to_compare[i:i + years_per_page]
+             for i in range(0, len(years_to_compare), years_per_page)]
+    if axes is not None:
+        axes = np.ravel(axes)  # Also for the 2D arrays of plt.subplots
+        if len(axes) < len(pages):
+            raise ValueError(str(len(pages)) + ' pages are needed but only ' +
+                             str(len(axes)) + ' axes were given.')
+
+    figures = []
+    pdf = PdfPages(pdf_file) if pdf_file else None
+    try:
+        for i, page in enumerate(pages):
+            if axes is not None:
+                ax = axes[i]
+            else:
+                fig, ax = plt.subplots(figsize=figsize)
+
+            draw_stacked_bar_graph(ax, df_to_analyze[years.isin(page)],
+                                   data_to_plot, page, data_label_dict,
+                                   color_dict, scenario_names,
+                                   legend_position, year_height, ylim,
+                                   collection, rasterized)
+
+            if pdf and axes is None:  # Save the page and free the memory
+                pdf.savefig(ax.figure)
+                plt.close(ax.figure)
+            elif ax.figure not in figures:
+                figures.append(ax.figure)
+
+        # Several pages can be on the same figure, saved once complete
+        if pdf:
+            for fig in figures:
+                pdf.savefig(fig)
+    finally:
+        if pdf:
+            pdf.close()
+
+    return df_to_analyze, figures
+
+
+def draw_stacked_bar_graph(ax, df_to_analyze, data_to_plot,
+                           years_to_compare, data_label_dict, color_dict,
+                           scenario_names, legend_position=False,
+                           year_height=3, ylim=False, collection=False,
+                           rasterized=False):
+    """
+    Draw the table prepared by stacked_bar_data on the ax, with the year
+    labels, the grey lines between the clusters and the legend. With
+    collection, every data is a single PathPatch instead of one Rectangle
+    per bar.
+
+    Parameters
+    ----------
+    ax : axes._axes.Axes
+        AN AXES OBJECT ENCAPSULATES ALL THE ELEMENTS OF AN INDIVIDUAL
+        (SUB-)PLOT IN A FIGURE.
+    df_to_analyze, data_to_plot : DataFrame, list of str
+        OUTPUT OF stacked_bar_data.
+    years_to_compare, data_label_dict, color_dict, scenario_names,
+    legend_position, year_height, collection, rasterized
+        SEE stacked_bar_graph.
+    ylim : tuple, optional
+        USE IF YOU WANT THE SAME Y-AXIS SCALE ON SEVERAL GRAPHS. THE FORMAT IS
+        (YMIN, YMAX). The default is False.
+
+    """
 
     # Setting all the labels that will be shown in the right order
     scenario_labels = [df_to_analyze.index[i][1]
                        for i in range(len(df_to_analyze))]
-    # Position of the years and vertical grey lines
-    year_positions, vline_positions = [0], []
+    # Position of the bars, the years and the vertical grey lines
+    scenario_positions, year_positions, vline_positions = \
+        _stacked_bar_positions(df_to_analyze, scenario_names)
     bottom = np.zeros(len(df_to_analyze))
-    scenario_positions = np.zeros(len(df_to_analyze))
 
-    for i, data in enumerate(data_to_compare):  # For all the types of data
-        position = 0
-        data_label = data_label_dict[data]
-        color = color_dict[data]
-        for j in range(len(df_to_analyze)):  # For all the bars to plot
-            df = df_to_analyze.iloc[j]  # Select each row
-
-            # If we have a new cluster, do a bigger space
-            if (df.name[1] == scenario_names[0]) and j != 0:
-                vline_positions.append(position)
-                position += 1
-
-                if len(scenario_names) % 2 != 0:  # If odd number of scenarios
-                    year_positions.append(position+int(len(scenario_names)/2))
-                else:  # If even number of scenario
-                    year_positions.append(position+len(scenario_names)/2-0.5)
-            scenario_positions[j] = position
-
-            if j == 0:  # To avoid multiple legends for the same data
-                ax.bar(position, df[data], width=0.5, bottom=bottom[j],
-                       color=color, label=data_label, zorder=3)
-            else:
-                ax.bar(position, df[data], width=0.5, bottom=bottom[j],
-                       color=color, zorder=3)
-            bottom[j] += df[data]
-            position += 1
+    for data in data_to_plot:  # For all the types of data
+        heights = df_to_analyze[data].to_numpy(dtype=float)
+        # Only draw the bars that are visible
+        bars = np.flatnonzero(heights)
+        color = _stacked_bar_color(data, color_dict)
+        data_label = _stacked_bar_label(data, data_label_dict)
+        if collection:
+            left = scenario_positions[bars] - 0.25
+            right = scenario_positions[bars] + 0.25
+            lower = bottom[bars]
+            upper = bottom[bars] + heights[bars]
+            # All the rectangles in one path, closed one after the other
+            vertices = np.stack([np.column_stack([left, lower]),
+                                 np.column_stack([left, upper]),
+                                 np.column_stack([right, upper]),
+                                 np.column_stack([right, lower]),
+                                 np.column_stack([left, lower])], axis=1)
+            codes = np.tile([Path.MOVETO, Path.LINETO, Path.LINETO,
+                             Path.LINETO, Path.CLOSEPOLY], len(bars))
+            bar_patch = PathPatch(Path(vertices.reshape(-1, 2), codes),
+                                  facecolor=color, linewidth=0,
+                                  label=data_label, zorder=3,
+                                  rasterized=rasterized)
+            bar_patch.sticky_edges.y.append(0)  # Like ax.bar
+            ax.add_patch(bar_patch)
+        else:
+            ax.bar(scenario_positions[bars], heights[bars], width=0.5,
+                   bottom=bottom[bars], color=color, label=data_label,
+                   zorder=3, rasterized=rasterized)
+        bottom += heights
+    if collection:
+        ax.autoscale_view()
 
     # Remove repetitions from loop
     year_positions = year_positions[:len(years_to_compare)]
     vline_positions = vline_positions[:len(years_to_compare) - 1]
 
+    if ylim:  # Same scale for all the pages
+        ax.set_ylim(ylim)
+
     # Add a text box to show the year for multiple scenarios
+    ymin, ymax = ax.get_ylim()
     for i, year in enumerate(years_to_compare):
-        ax.text(year_positions[i], (ax.get_ylim()[0] -
-                                    ax.get_ylim()[1])/year_height,
+        ax.text(year_positions[i], (ymin - ymax)/year_height,
                 year, ha='center')
 
         if i >= 1:  # Add the gray lines
             ax.annotate('', xy=(vline_positions[i - 1], 0),
                         xycoords='data',
                         xytext=(vline_positions[i - 1],
-                                (ax.get_ylim()[0] -
-                                 ax.get_ylim()[1])/year_height),
+                                (ymin - ymax)/year_height),
                         arrowprops=dict(arrowstyle="-",
                                         color='lightgray'))
     # Add scenario names and legend
@@ -161,14 +338,175 @@ def stacked_bar_graph(ax, dataframes, x_var, y_var,
     else:
         ax.legend(reversed(handles), reversed(labels))
 
-    return df_to_analyze
+
+def stacked_bar_data(dataframes, x_var, y_var, years_to_compare,
+                     data_to_compare, scenario_names, baseline_year,
+                     baseline_name, specific_variable_title=False,
+                     specific_variable_name=False, top_k=False,
+                     sparse=False):
+    """
+    Prepare the table of the stacked_bar_graph without plotting it, with one
+    row per bar and one column per data to stack. The data are kept in long
+    format until the end so that only the data that will be displayed are
+    pivoted.
+
+    Parameters
+    ----------
+    dataframes, x_var, y_var, years_to_compare, data_to_compare,
+    scenario_names, baseline_year, baseline_name, specific_variable_title,
+    specific_variable_name, top_k, sparse
+        SEE stacked_bar_graph.
+
+    Returns
+    -------
+    df_to_analyze : DataFrame
+        DataFrame of the graph output.
+    data_to_plot : list of str
+        DATA TO STACK FROM BOTTOM TO TOP. CAN INCLUDE 'Other' IF top_k IS
+        SPECIFIED.
+
+    """
+
+    df_list = []
+    for i, scenarios in enumerate(dataframes):  # For every scenario
+        df = scenarios
+        mask = np.ones(len(df), dtype=bool)
+
+        # If we want to look at only one country for example
+        if specific_variable_title and specific_variable_name:
+            mask &= (df[specific_variable_title] ==
+                     specific_variable_name).to_numpy()
+
+        # To have only one bar for the baseline year
+        if (scenario_names[i] != baseline_name):
+            mask &= (df[x_var] != baseline_year).to_numpy()
+
+        # To only show the years and data to compare
+        df = _select_rows(df, {x_var: years_to_compare,
+                               y_var: data_to_compare}, mask)
+
+        # Add a mark to identify which scenario it is
+        df['Scenario'] = scenario_names[i]
+        df['plot order'] = i  # To plot the bars in the right order
+
+        values = 'value' if 'value' in df.columns else 'level'
+        # Same aggregation as pivot_table, but without the empty cells
+        df = df.groupby([x_var, 'Scenario', 'plot order', y_var],
+                        observed=True)[values].mean()
+        df_list.append(df)
+
+    df_long = pd.concat(df_list)
+    df_long = df_long[df_long.notna()]
+
+    data_to_plot = [data for data in data_to_compare
+                    if data in df_long.index.get_level_values(y_var)]
+    if top_k and len(data_to_plot) > top_k:
+        # Keep the data with the largest contribution, sum up the rest
+        contribution = df_long.abs().groupby(level=y_var).sum()
+        data_to_keep = contribution.nlargest(top_k).index
+        data_to_plot = [data for data in data_to_plot if data in data_to_keep]
+        data = df_long.index.get_level_values(y_var)
+        df_other = df_long[~data.isin(data_to_keep)]
+        df_other = df_other.groupby(level=[x_var, 'Scenario', 'plot order'],
+                                    observed=True).sum()
+        df_long = df_long[data.isin(data_to_keep)]
+        data_to_plot.append('Other')
+    else:
+        df_other = None
+
+    # One row per bar
+    rows = df_long.index.droplevel(y_var).unique()
+    if df_other is not None:
+        rows = rows.union(df_other.index)
+    rows = rows.sort_values()
+
+    # One column per data, filled one at a time
+    columns = {}
+    data = df_long.index.get_level_values(y_var)
+    for column in data_to_plot:
+        if column == 'Other':
+            df = df_other
+        else:
+            df = df_long[data == column].droplevel(y_var)
+        values = np.zeros(len(rows))
+        values[rows.get_indexer(df.index)] = df.to_numpy()
+        if sparse:
+            values = pd.arrays.SparseArray(values, fill_value=0)
+        columns[column] = values
+
+    df_to_analyze = pd.DataFrame(columns, index=rows)
+    df_to_analyze.columns.name = y_var
+    df_to_analyze = df_to_analyze.sort_values(by=[x_var, 'plot order'])
+
+    return df_to_analyze, data_to_plot
+
+
+def _stacked_bar_positions(df_to_analyze, scenario_names):
+    """
+    Compute the position of every bar of the stacked_bar_graph, leaving a
+    bigger space between the clusters of years.
+
+    Returns
+    -------
+    scenario_positions : array
+        POSITION OF EVERY BAR ON THE X AXIS.
+    year_positions : list
+        POSITION OF THE YEAR LABELS, AT THE CENTER OF EVERY CLUSTER.
+    vline_positions : list
+        POSITION OF THE VERTICAL GREY LINES BETWEEN THE CLUSTERS.
+
+    """
+
+    year_positions, vline_positions = [0], []
+    scenario_positions = np.zeros(len(df_to_analyze))
+    position = 0
+    for j, name in enumerate(df_to_analyze.index):  # For all the bars
+        # If we have a new cluster, do a bigger space
+        if (name[1] == scenario_names[0]) and j != 0:
+            vline_positions.append(position)
+            position += 1
+
+            if len(scenario_names) % 2 != 0:  # If odd number of scenarios
+                year_positions.append(position+int(len(scenario_names)/2))
+            else:  # If even number of scenario
+                year_positions.append(position+len(scenario_names)/2-0.5)
+        scenario_positions[j] = position
+        position += 1
+
+    return scenario_positions, year_positions, vline_positions
+
+
+def _stacked_bar_ylim(df_to_analyze):
+    """Y limits including every stacked bar, with the default margins."""
+    tops = df_to_analyze.clip(lower=0).sum(axis=1)
+    bottoms = df_to_analyze.clip(upper=0).sum(axis=1)
+    ymin, ymax = min(bottoms.min(), 0), max(tops.max(), 0)
+    margin = (ymax - ymin)*plt.rcParams['axes.ymargin']
+    # The bars start at 0, so there is no margin on this side
+    return (ymin - margin if ymin < 0 else 0,
+            ymax + margin if ymax > 0 else 0)
+
+
+def _stacked_bar_label(data, data_label_dict):
+    """Legend label of a data of the stacked_bar_graph."""
+    if data == 'Other':
+        return data_label_dict.get('Other', 'Other')
+    return data_label_dict[data]
+
+
+def _stacked_bar_color(data, color_dict):
+    """Color of a data of the stacked_bar_graph."""
+    if data == 'Other':
+        return color_dict.get('Other', 'lightgray')
+    return color_dict[data]
 
 
 def graph_2_variables(kind, ax, dataframe, x_var, y_var,
                       years_to_compare, data_to_compare,
                       data_label_dict, color_dict, linestyle=False,
                       marker_dict=False, linewidth = False,
-                      legend_position=False, return_legend=False):
+                      legend_position=False, return_legend=False,
+                      rasterized=False):
     """
 
 
@@ -211,80 +549,67 @@ def graph_2_variables(kind, ax, dataframe, x_var, y_var,
     return_legend : bool, optional
         USE IF YOU WANT THE LEGEND TO BE RETURNED IN THE RIGHT ORDER TO PLOT
         (USEFULL TO PLOT OTHER DATA ON THE SAME GRAPH).
+    rasterized : bool, optional
+        USE IF YOU WANT THE LINES, AREAS, BARS AND MARKERS TO BE SAVED AS AN
+        IMAGE IN VECTOR FILES (SVG, PDF). THE AXES AND TEXT STAY IN VECTOR
+        FORMAT. USEFULL TO REDUCE THE SIZE OF DENSE GRAPHS.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+
+    """
+
+    df_to_plot, legend, marker_frames = graph_2_variables_data(
+        dataframe, x_var, y_var, years_to_compare, data_to_compare,
+        data_label_dict, markers=bool(marker_dict and kind == 'line'))
+
+    return draw_graph(kind, ax, df_to_plot, legend, marker_frames, x_var,
+                      color_dict, linestyle, marker_dict, linewidth,
+                      legend_position, return_legend, rasterized)
+
+
+def graph_2_variables_data(dataframe, x_var, y_var, years_to_compare,
+                           data_to_compare, data_label_dict, markers=False):
+    """
+    Prepare the table of the graph_2_variables without plotting it.
+
+    Parameters
+    ----------
+    dataframe, x_var, y_var, years_to_compare, data_to_compare,
+    data_label_dict
+        SEE graph_2_variables.
+    markers : bool, optional
+        USE IF YOU ALSO WANT THE ROWS OF EVERY DATA TO PLOT THE MARKERS.
 
     Returns
     -------
     df_to_plot : DataFrame
         DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS, BASED ON THE SAME KEYS AS
+        THE color_dict. EMPTY IF markers IS False.
 
     """
 
-    df = dataframe
-    df = df[df[x_var].isin(years_to_compare)]
-    df = df[df[y_var].isin(data_to_compare)]
+    df = _select_rows(dataframe, {x_var: years_to_compare,
+                                  y_var: data_to_compare})
     df = df.astype({x_var: int})  # So that the years are numbers and not str
-    df_list = []
+    columns = []
     legend = []
+    marker_frames = {}
     for data in data_to_compare:
-        df_to_analyze = df.loc[df[y_var] == data]
-
-        # Adding markers
-        if marker_dict and kind == 'line':
-            if 'value' in df_to_analyze.columns:
-                df_to_analyze.plot(kind='scatter', x=x_var, y='value',
-                                   ax=ax, legend=False,
-                                   color=color_dict[data],
-                                   marker=marker_dict[data], s=20)
-            else:
-                df_to_analyze.plot(kind='scatter', x=x_var, y='level',
-                                   ax=ax, legend=False,
-                                   color=color_dict[data],
-                                   marker=marker_dict[data], s=20)
-        if 'value' in df_to_analyze.columns:
-            df_to_analyze = df_to_analyze.pivot_table(index=[x_var],
-                                                      columns=y_var,
-                                                      values='value')
-        else:
-            df_to_analyze = df_to_analyze.pivot_table(index=[x_var],
-                                                      columns=y_var,
-                                                      values='level')
-        df_list.append(df_to_analyze)
+        if markers:  # Rows to plot the markers
+            marker_frames[data] = df.loc[df[y_var] == data]
+        columns.append(data)
         legend.append(data_label_dict[data])
 
-    df_to_plot = pd.concat(df_list, axis=1)
-    if kind == 'line':
-        if linestyle and linewidth:# If we specify the linestyle and linewidth
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linestyle = linestyle[column],
-                                        linewidth = linewidth[column])
-        elif linestyle: # If we specify the linestyle
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linestyle = linestyle[column])
-        elif linewidth: # If we specify the linewidth
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linewidth = linewidth[column])
-        else: # If we do not specify either linestyle nor linewidth
-            df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
-    else: # If not a line graph
-        df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
+    df_to_plot = _pivot_columns(df, x_var, [y_var], columns)
 
-    if return_legend:
-        return df_to_plot, legend
-    else:
-        handles, labels = ax.get_legend_handles_labels()
-        if legend_position:  # Specify legend position
-            ax.legend(reversed(handles), reversed(legend),
-                      bbox_to_anchor=legend_position)
-        else:
-            ax.legend(reversed(handles), reversed(legend))
-
-    return df_to_plot
+    return df_to_plot, legend, marker_frames
 
 
 def graph_3_variables(kind, ax, dataframe, x_var, y_var, z_var,
@@ -292,7 +617,7 @@ def graph_3_variables(kind, ax, dataframe, x_var, y_var, z_var,
                       y_var_label_dict, color_dict, z_var_label_dict,
                       linestyle=False, marker_dict=False,
                       linewidth = False, legend_position=False,
-                      return_legend=False):
+                      return_legend=False, rasterized=False):
     """
 
 
@@ -342,6 +667,10 @@ def graph_3_variables(kind, ax, dataframe, x_var, y_var, z_var,
     return_legend : bool, optional
         USE IF YOU WANT THE LEGEND TO BE RETURNED IN THE RIGHT ORDER TO PLOT
         (USEFULL TO PLOT OTHER DATA ON THE SAME GRAPH).
+    rasterized : bool, optional
+        USE IF YOU WANT THE LINES, AREAS, BARS AND MARKERS TO BE SAVED AS AN
+        IMAGE IN VECTOR FILES (SVG, PDF). THE AXES AND TEXT STAY IN VECTOR
+        FORMAT. USEFULL TO REDUCE THE SIZE OF DENSE GRAPHS.
 
     Returns
     -------
@@ -350,81 +679,62 @@ def graph_3_variables(kind, ax, dataframe, x_var, y_var, z_var,
 
     """
 
-    df = dataframe
-    df = df[df[x_var].isin(years_to_compare)]
-    df = df[df[y_var].isin(y_var_to_compare)]
+    df_to_plot, legend, marker_frames = graph_3_variables_data(
+        dataframe, x_var, y_var, z_var, years_to_compare, y_var_to_compare,
+        z_var_to_compare, y_var_label_dict, z_var_label_dict,
+        markers=bool(marker_dict and kind == 'line'))
+
+    return draw_graph(kind, ax, df_to_plot, legend, marker_frames, x_var,
+                      color_dict, linestyle, marker_dict, linewidth,
+                      legend_position, return_legend, rasterized)
+
+
+def graph_3_variables_data(dataframe, x_var, y_var, z_var, years_to_compare,
+                           y_var_to_compare, z_var_to_compare,
+                           y_var_label_dict, z_var_label_dict,
+                           markers=False):
+    """
+    Prepare the table of the graph_3_variables without plotting it.
+
+    Parameters
+    ----------
+    dataframe, x_var, y_var, z_var, years_to_compare, y_var_to_compare,
+    z_var_to_compare, y_var_label_dict, z_var_label_dict
+        SEE graph_3_variables.
+    markers : bool, optional
+        USE IF YOU ALSO WANT THE ROWS OF EVERY DATA TO PLOT THE MARKERS.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS, BASED ON THE SAME KEYS AS
+        THE color_dict. EMPTY IF markers IS False.
+
+    """
+
+    df = _select_rows(dataframe, {x_var: years_to_compare,
+                                  y_var: y_var_to_compare,
+                                  z_var: z_var_to_compare})
     df = df.astype({x_var: int})
-    df_list = []
+    columns = []
     legend = []
+    marker_frames = {}
     for data in y_var_to_compare:
         for data_z in z_var_to_compare:
-            df_to_analyze = df.loc[(df[y_var] == data) & (df[z_var] == data_z)]
-
-            if marker_dict and kind == 'line':
-                if 'value' in df_to_analyze.columns:
-
-                    df_to_analyze.plot(kind='scatter', x=x_var,
-                                       y='value', ax=ax,
-                                       legend=False,
-                                       color=color_dict[(data,  data_z)],
-                                       marker=marker_dict[(data,  data_z)],
-                                       s=20)
-                else:
-                    df_to_analyze.plot(kind='scatter', x=x_var,
-                                       y='level', ax=ax,
-                                       legend=False,
-                                       color=color_dict[(data,  data_z)],
-                                       marker=marker_dict[(data,  data_z)],
-                                       s=20)
-            if 'value' in df_to_analyze.columns:
-                df_to_analyze = df_to_analyze.pivot_table(index=[x_var],
-                                                          columns=[
-                                                              y_var, z_var],
-                                                          values='value')
-            else:
-                df_to_analyze = df_to_analyze.pivot_table(index=[x_var],
-                                                          columns=[
-                                                              y_var, z_var],
-                                                          values='level')
-            df_list.append(df_to_analyze)
+            if markers:  # Rows to plot the markers
+                marker_frames[(data, data_z)] = \
+                    df.loc[(df[y_var] == data) & (df[z_var] == data_z)]
+            columns.append((data, data_z))
             legend.append(y_var_label_dict[data] + ' ' +
                           z_var_label_dict[data_z])
 
-    df_to_plot = pd.concat(df_list, axis=1)
+    df_to_plot = _pivot_columns(df, x_var, [y_var, z_var], columns)
 
-    if kind == 'line':
-        if linestyle and linewidth:# If we specify the linestyle and linewidth
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linestyle = linestyle[column],
-                                        linewidth = linewidth[column])
-        elif linestyle: # If we specify the linestyle
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linestyle = linestyle[column])
-        elif linewidth: # If we specify the linewidth
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linewidth = linewidth[column])
-        else: # If we do not specify either linestyle nor linewidth
-            df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
-    else: # If not a line graph
-        df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
-
-    if return_legend:
-        return df_to_plot, legend
-    else:
-        handles, labels = ax.get_legend_handles_labels()
-        if legend_position:  # Specify legend position
-            ax.legend(reversed(handles), reversed(legend),
-                      bbox_to_anchor=legend_position)
-        else:
-            ax.legend(reversed(handles), reversed(legend))
-
-    return df_to_plot
+    return df_to_plot, legend, marker_frames
 
 
 def graph_mulitple_scenarios_2_variables(kind, ax, dataframes, x_var, y_var,
@@ -434,7 +744,8 @@ def graph_mulitple_scenarios_2_variables(kind, ax, dataframes, x_var, y_var,
                                          marker_dict=False,
                                          linewidth = False,
                                          legend_position=False,
-                                         return_legend=False):
+                                         return_legend=False,
+                                         rasterized=False):
     """
 
 
@@ -481,89 +792,83 @@ def graph_mulitple_scenarios_2_variables(kind, ax, dataframes, x_var, y_var,
     return_legend : bool, optional
         USE IF YOU WANT THE LEGEND TO BE RETURNED IN THE RIGHT ORDER TO PLOT
         (USEFULL TO PLOT OTHER DATA ON THE SAME GRAPH).
+    rasterized : bool, optional
+        USE IF YOU WANT THE LINES, AREAS, BARS AND MARKERS TO BE SAVED AS AN
+        IMAGE IN VECTOR FILES (SVG, PDF). THE AXES AND TEXT STAY IN VECTOR
+        FORMAT. USEFULL TO REDUCE THE SIZE OF DENSE GRAPHS.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+
+    """
+
+    df_to_plot, legend, marker_frames = \
+        graph_mulitple_scenarios_2_variables_data(
+            dataframes, x_var, y_var, years_to_compare, data_to_compare,
+            data_label_dict, scenario_names,
+            markers=bool(marker_dict and kind == 'line'))
+
+    return draw_graph(kind, ax, df_to_plot, legend, marker_frames, x_var,
+                      color_dict, linestyle, marker_dict, linewidth,
+                      legend_position, return_legend, rasterized)
+
+
+def graph_mulitple_scenarios_2_variables_data(dataframes, x_var, y_var,
+                                              years_to_compare,
+                                              data_to_compare,
+                                              data_label_dict, scenario_names,
+                                              markers=False):
+    """
+    Prepare the table of the graph_mulitple_scenarios_2_variables without
+    plotting it.
+
+    Parameters
+    ----------
+    dataframes, x_var, y_var, years_to_compare, data_to_compare,
+    data_label_dict, scenario_names
+        SEE graph_mulitple_scenarios_2_variables.
+    markers : bool, optional
+        USE IF YOU ALSO WANT THE ROWS OF EVERY DATA TO PLOT THE MARKERS.
 
     Returns
     -------
     df_to_plot : DataFrame
         DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS, BASED ON THE SAME KEYS AS
+        THE color_dict. EMPTY IF markers IS False.
 
     """
 
     df_list = []
     for i, scenario in enumerate(dataframes):
-        df = scenario
-        df['Scenario'] = scenario_names[i]
-        df = df[df[x_var].isin(years_to_compare)]
-        df = df[df[y_var].isin(data_to_compare)]
+        df = _select_rows(scenario, {x_var: years_to_compare,
+                                     y_var: data_to_compare})
         df = df.astype({x_var: int})
+        df['Scenario'] = scenario_names[i]
         df_list.append(df)
 
     df_to_analyze = pd.concat(df_list)
-    df_list = []
+    columns = []
     legend = []
+    marker_frames = {}
     for data in data_to_compare:
         for scenario in scenario_names:
-            df = df_to_analyze.loc[(df_to_analyze.Scenario == scenario) &
-                                   (df_to_analyze[y_var] == data)]
-
-            if marker_dict and kind == 'line':
-                if 'value' in df_to_analyze.columns:
-
-                    df.plot(kind='scatter', x=x_var, y='value', ax=ax,
-                            legend=False,
-                            color=color_dict[(data,  scenario)],
-                            marker=marker_dict[(data,  scenario)],
-                            s=20)
-                else:
-                    df.plot(kind='scatter', x=x_var, y='level', ax=ax,
-                            legend=False,
-                            color=color_dict[(data,  scenario)],
-                            marker=marker_dict[(data,  scenario)],
-                            s=20)
-            if 'value' in df.columns:
-                df = df.pivot_table(index=[x_var],
-                                    columns=[y_var, 'Scenario'],
-                                    values='value')
-            else:
-                df = df.pivot_table(index=[x_var],
-                                    columns=[y_var, 'Scenario'],
-                                    values='level')
-            df_list.append(df)
+            if markers:  # Rows to plot the markers
+                marker_frames[(data, scenario)] = df_to_analyze.loc[
+                    (df_to_analyze.Scenario == scenario) &
+                    (df_to_analyze[y_var] == data)]
+            columns.append((data, scenario))
             legend.append(data_label_dict[data] + ' ' + scenario)
 
-    df_to_plot = pd.concat(df_list, axis=1)
-    if kind == 'line':
-        if linestyle and linewidth:# If we specify the linestyle and linewidth
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linestyle = linestyle[column],
-                                        linewidth = linewidth[column])
-        elif linestyle: # If we specify the linestyle
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linestyle = linestyle[column])
-        elif linewidth: # If we specify the linewidth
-            for column in df_to_plot.columns:
-                df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
-                                        linewidth = linewidth[column])
-        else: # If we do not specify either linestyle nor linewidth
-            df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
-    else: # If not a line graph
-        df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
-    if return_legend:
-        return df_to_plot, legend
-    else:
-        handles, labels = ax.get_legend_handles_labels()
-        if legend_position:  # Specify legend position
-            ax.legend(reversed(handles), reversed(legend),
-                      bbox_to_anchor=legend_position)
-        else:
-            ax.legend(reversed(handles), reversed(legend))
+    df_to_plot = _pivot_columns(df_to_analyze, x_var, [y_var, 'Scenario'],
+                                columns)
 
-    return df_to_plot
+    return df_to_plot, legend, marker_frames
 
 
 def graph_mulitple_scenarios_3_variables(kind, ax, dataframes, x_var, y_var,
@@ -574,7 +879,8 @@ def graph_mulitple_scenarios_3_variables(kind, ax, dataframes, x_var, y_var,
                                          linestyle=False, marker_dict=False,
                                          linewidth = False,
                                          legend_position=False,
-                                         return_legend=False):
+                                         return_legend=False,
+                                         rasterized=False):
     """
 
 
@@ -628,83 +934,265 @@ def graph_mulitple_scenarios_3_variables(kind, ax, dataframes, x_var, y_var,
     return_legend : bool, optional
         USE IF YOU WANT THE LEGEND TO BE RETURNED IN THE RIGHT ORDER TO PLOT
         (USEFULL TO PLOT OTHER DATA ON THE SAME GRAPH).
+    rasterized : bool, optional
+        USE IF YOU WANT THE LINES, AREAS, BARS AND MARKERS TO BE SAVED AS AN
+        IMAGE IN VECTOR FILES (SVG, PDF). THE AXES AND TEXT STAY IN VECTOR
+        FORMAT. USEFULL TO REDUCE THE SIZE OF DENSE GRAPHS.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output.
+
+    """
+
+    df_to_plot, legend, marker_frames = \
+        graph_mulitple_scenarios_3_variables_data(
+            dataframes, x_var, y_var, z_var, years_to_compare,
+            y_var_to_compare, z_var_to_compare, y_var_label_dict,
+            z_var_label_dict, scenario_names,
+            markers=bool(marker_dict and kind == 'line'))
+
+    return draw_graph(kind, ax, df_to_plot, legend, marker_frames, x_var,
+                      color_dict, linestyle, marker_dict, linewidth,
+                      legend_position, return_legend, rasterized)
+
+
+def graph_mulitple_scenarios_3_variables_data(dataframes, x_var, y_var,
+                                              z_var, years_to_compare,
+                                              y_var_to_compare,
+                                              z_var_to_compare,
+                                              y_var_label_dict,
+                                              z_var_label_dict,
+                                              scenario_names, markers=False):
+    """
+    Prepare the table of the graph_mulitple_scenarios_3_variables without
+    plotting it.
+
+    Parameters
+    ----------
+    dataframes, x_var, y_var, z_var, years_to_compare, y_var_to_compare,
+    z_var_to_compare, y_var_label_dict, z_var_label_dict, scenario_names
+        SEE graph_mulitple_scenarios_3_variables.
+    markers : bool, optional
+        USE IF YOU ALSO WANT THE ROWS OF EVERY DATA TO PLOT THE MARKERS.
 
     Returns
     -------
     df_to_plot : DataFrame
         DataFrame of the graph output.
+    legend : list of str
+        LEGEND IN THE SAME ORDER AS THE COLUMNS OF df_to_plot.
+    marker_frames : dict
+        ROWS OF EVERY DATA TO PLOT THE MARKERS, BASED ON THE SAME KEYS AS
+        THE color_dict. EMPTY IF markers IS False.
 
     """
 
     df_list = []
     for i, scenario in enumerate(dataframes):
-        df = scenario
-        df['Scenario'] = scenario_names[i]
-        df = df[df[x_var].isin(years_to_compare)]
-        df = df[df[y_var].isin(y_var_to_compare)]
-        df = df[df[z_var].isin(z_var_to_compare)]
+        df = _select_rows(scenario, {x_var: years_to_compare,
+                                     y_var: y_var_to_compare,
+                                     z_var: z_var_to_compare})
         df = df.astype({x_var: int})
+        df['Scenario'] = scenario_names[i]
         df_list.append(df)
 
     df_to_analyze = pd.concat(df_list)
-    df_list = []
+    columns = []
     legend = []
+    marker_frames = {}
     for data_y in y_var_to_compare:
         for data_z in z_var_to_compare:
             for scenario in scenario_names:
-                df = df_to_analyze.loc[(df_to_analyze.Scenario == scenario) &
-                                       (df_to_analyze[y_var] == data_y) &
-                                       (df_to_analyze[z_var] == data_z)]
-
-                if marker_dict and kind == 'line':
-                    if 'value' in df_to_analyze.columns:
-                        df.plot(kind='scatter', x=x_var, y='value',
-                                ax=ax, legend=False,
-                                color=color_dict[(data_y,  data_z, scenario)],
-                                marker=marker_dict[(
-                                    data_y,  data_z, scenario)],
-                                s=20)
-                    else:
-                        df.plot(kind='scatter', x=x_var, y='level',
-                                ax=ax, legend=False,
-                                color=color_dict[(data_y,  data_z, scenario)],
-                                marker=marker_dict[(
-                                    data_y,  data_z, scenario)],
-                                s=20)
-                if 'value' in df.columns:
-                    df = df.pivot_table(index=[x_var],
-                                        columns=[y_var, z_var, 'Scenario'],
-                                        values='value')
-                else:
-                    df = df.pivot_table(index=[x_var],
-                                        columns=[y_var, z_var, 'Scenario'],
-                                        values='level')
-                df_list.append(df)
+                if markers:  # Rows to plot the markers
+                    marker_frames[(data_y, data_z, scenario)] = \
+                        df_to_analyze.loc[
+                            (df_to_analyze.Scenario == scenario) &
+                            (df_to_analyze[y_var] == data_y) &
+                            (df_to_analyze[z_var] == data_z)]
+                columns.append((data_y, data_z, scenario))
                 legend.append(y_var_label_dict[data_y] + ' ' +
                               z_var_label_dict[data_z] + ' ' + scenario)
 
-    df_to_plot = pd.concat(df_list, axis=1)
+    df_to_plot = _pivot_columns(df_to_analyze, x_var,
+                                [y_var, z_var, 'Scenario'], columns)
+
+    return df_to_plot, legend, marker_frames
+
+
+def aggregate_chunks(chunks, selection, aggfunc='mean'):
+    """
+
+
+    Parameters
+    ----------
+    chunks : iterable of DataFrame
+        RECORDS OF A SYMBOL READ PIECE BY PIECE, FOR EXAMPLE A GENERATOR OF
+        DataFrames OR OF RECORD BATCHES WITH A to_pandas METHOD. EVERY CHUNK
+        HAS THE SAME COLUMNS AS THE RECORDS OF THE SYMBOL.
+    selection : dict
+        VALUES TO KEEP FOR EVERY COLUMN OF THE GRAPH, FOR EXAMPLE
+        {x_var: years_to_compare, y_var: data_to_compare}. ALL THE OTHER
+        COLUMNS ARE AGGREGATED.
+    aggfunc : str, optional
+        AGGREGATION OF THE VALUES WITH THE SAME COLUMNS OF THE GRAPH. EITHER
+        mean, sum OR last. The default is 'mean', LIKE IN THE GRAPHS.
+
+    Returns
+    -------
+    df : DataFrame
+        ONE ROW PER COMBINATION OF THE SELECTED VALUES, WITH THE COLUMNS OF
+        selection AND THE 'value' OR 'level' COLUMN. CAN BE GIVEN TO ANY OF
+        THE GRAPH FUNCTIONS. ONLY ONE CHUNK AND THE AGGREGATED VALUES ARE IN
+        MEMORY AT THE SAME TIME.
+
+    """
+
+    if aggfunc not in ['mean', 'sum', 'last']:
+        raise ValueError(aggfunc + ' is not one of: mean, sum, last')
+
+    keys = list(selection)
+    values = 'value'
+    partials = None
+    for chunk in chunks:
+        if not isinstance(chunk, pd.DataFrame):  # Record batches
+            chunk = chunk.to_pandas()
+        values = 'value' if 'value' in chunk.columns else 'level'
+        df = _select_rows(chunk, selection)
+        del chunk
+
+        # Partial aggregation of the chunk
+        grouped = df.groupby(keys, observed=True, sort=False)[values]
+        if aggfunc == 'last':
+            partial = grouped.last().to_frame('last')
+        else:
+            partial = grouped.agg(['sum', 'count'])
+
+        # Combined with the partial aggregation of the previous chunks
+        if partials is not None:
+            partial = pd.concat([partials, partial])
+            grouped = partial.groupby(level=keys, observed=True, sort=False)
+            partial = grouped.last() if aggfunc == 'last' else grouped.sum()
+        partials = partial
+
+    if partials is None:  # No chunk
+        return pd.DataFrame(columns=keys + [values])
+    if aggfunc == 'mean':
+        df = partials['sum']/partials['count']
+    else:
+        df = partials[aggfunc]
+    return df.rename(values).reset_index()
+
+
+def _select_rows(df, selection, mask=None):
+    """
+    Rows of df where every column of selection is in the selected values,
+    with only these columns and the values. A single mask is built for all
+    the columns, so that the only copy is the one of the selected rows.
+
+    """
+
+    values = 'value' if 'value' in df.columns else 'level'
+    if mask is None:
+        mask = np.ones(len(df), dtype=bool)
+    for column, selected in selection.items():
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            # Lookup of the codes, the last entry is for the missing values
+            categories = df[column].cat.categories
+            codes = categories.get_indexer(pd.Index(selected))
+            lookup = np.zeros(len(categories) + 1, dtype=bool)
+            lookup[codes[codes >= 0]] = True
+            mask &= lookup[df[column].cat.codes.to_numpy()]
+        else:
+            mask &= df[column].isin(selected).to_numpy()
+    return df.loc[mask, list(selection) + [values]]
+
+
+def _pivot_columns(df, x_var, column_vars, columns):
+    """
+    Pivot df once with one column per entry of columns, in the same order.
+    Same result as pivoting every column separately and concatenating them,
+    the columns without any data are left out.
+
+    """
+
+    values = 'value' if 'value' in df.columns else 'level'
+    df_to_plot = df.pivot_table(index=[x_var], columns=column_vars,
+                                values=values)
+    df_to_plot = df_to_plot[[column for column in columns
+                             if column in df_to_plot.columns]]
+    return df_to_plot.dropna(how='all')
+
+
+def draw_graph(kind, ax, df_to_plot, legend, marker_frames, x_var,
+               color_dict, linestyle=False, marker_dict=False,
+               linewidth=False, legend_position=False, return_legend=False,
+               rasterized=False):
+    """
+    Draw the table prepared by one of the *_data functions on the ax, with
+    the markers and the legend. Shared by all the graph functions except the
+    stacked_bar_graph.
+
+    Parameters
+    ----------
+    kind : str
+        CHOOSES THE TYPE OF GRAPH TO PLOT.
+        CAN BE EITHER line, area, bar or barh.
+    ax : axes._axes.Axes
+        AN AXES OBJECT ENCAPSULATES ALL THE ELEMENTS OF AN INDIVIDUAL
+        (SUB-)PLOT IN A FIGURE.
+    df_to_plot, legend, marker_frames : DataFrame, list of str, dict
+        OUTPUT OF THE *_data FUNCTION. marker_frames HAS TO BE PREPARED WITH
+        markers=True TO DRAW THE MARKERS.
+    x_var, color_dict, linestyle, marker_dict, linewidth, legend_position,
+    return_legend, rasterized
+        SEE THE GRAPH FUNCTION OF THE *_data FUNCTION.
+
+    Returns
+    -------
+    df_to_plot : DataFrame
+        DataFrame of the graph output. WITH return_legend, THE legend IS ALSO
+        RETURNED.
+
+    """
+
+    # Adding markers
+    if marker_dict and kind == 'line':
+        for key, df in marker_frames.items():
+            if 'value' in df.columns:
+                df.plot(kind='scatter', x=x_var, y='value', ax=ax,
+                        legend=False, rasterized=rasterized,
+                        color=color_dict[key], marker=marker_dict[key], s=20)
+            else:
+                df.plot(kind='scatter', x=x_var, y='level', ax=ax,
+                        legend=False, rasterized=rasterized,
+                        color=color_dict[key], marker=marker_dict[key], s=20)
+
     if kind == 'line':
         if linestyle and linewidth:# If we specify the linestyle and linewidth
             for column in df_to_plot.columns:
                 df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
+                                        legend=False, rasterized=rasterized,
                                         linestyle = linestyle[column],
                                         linewidth = linewidth[column])
         elif linestyle: # If we specify the linestyle
             for column in df_to_plot.columns:
                 df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
+                                        legend=False, rasterized=rasterized,
                                         linestyle = linestyle[column])
         elif linewidth: # If we specify the linewidth
             for column in df_to_plot.columns:
                 df_to_plot[column].plot(kind=kind, ax=ax, color=color_dict,
-                                        legend=False,
+                                        legend=False, rasterized=rasterized,
                                         linewidth = linewidth[column])
         else: # If we do not specify either linestyle nor linewidth
-            df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
+            df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False,
+                            rasterized=rasterized)
     else: # If not a line graph
-        df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False)
+        df_to_plot.plot(kind=kind, ax=ax, color=color_dict, legend=False,
+                        rasterized=rasterized)
+
     if return_legend:
         return df_to_plot, legend
     else:
@@ -718,6 +1206,41 @@ def graph_mulitple_scenarios_3_variables(kind, ax, dataframes, x_var, y_var,
     return df_to_plot
 
 
+def graph_to_bytes(graph_function, file_format='png', figsize=None, dpi=None,
+                   **kwargs):
+    """
+
+
+    Parameters
+    ----------
+    graph_function : function
+        ONE OF THE GRAPH FUNCTIONS OF THIS MODULE, FOR EXAMPLE
+        graph_2_variables.
+    file_format : str, optional
+        FORMAT OF THE FILE. EITHER png, svg OR pdf. The default is 'png'.
+    figsize : tuple, optional
+        SIZE OF THE FIGURE. THE FORMAT IS (WIDTH, HEIGHT).
+    dpi : float, optional
+        RESOLUTION OF THE FIGURE.
+    **kwargs
+        ARGUMENTS OF THE graph_function, WITHOUT ax.
+
+    Returns
+    -------
+    bytes
+        FILE OF THE GRAPH. THE FIGURE IS CREATED WITHOUT pyplot, SO THAT
+        MULTIPLE GRAPHS CAN BE RENDERED AT THE SAME TIME IN DIFFERENT
+        THREADS.
+
+    """
+
+    fig = Figure(figsize=figsize)
+    graph_function(ax=fig.add_subplot(), **kwargs)
+    output = io.BytesIO()
+    fig.savefig(output, format=file_format, dpi=dpi, bbox_inches='tight')
+    return output.getvalue()
+
+
 def verification(gdx_files, name, x_var, y_var, years_to_compare,
                  data_to_compare, z_var=False, z_var_to_compare=False):
     """
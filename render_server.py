@@ -0,0 +1,476 @@
+# -*- coding: utf-8 -*-
+"""
+Local render server keeping the data loaded between the graphs.
+
+A long-running process loads the symbols once and renders the graphs of the
+functions module on request. A request is a JSON object such as:
+
+    {"function": "graph_2_variables",
+     "data": "symbol name",
+     "args": {"kind": "line", "x_var": "Year", ...},
+     "format": "png"}
+
+and the answer is the PNG or SVG file. The server listens on localhost or on
+a Unix socket:
+
+    $ python render_server.py --port 8765 --gdx scenario1.gdx scenario2.gdx
+
+and the render function of this module can be used as a client.
+"""
+
+import argparse
+import functools
+import http.client
+import inspect
+import json
+import os
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import matplotlib
+matplotlib.use('Agg')
+
+import functions
+
+# Graph functions that can be requested, with their argument for the data
+GRAPH_FUNCTIONS = {
+    'stacked_bar_graph': 'dataframes',
+    'graph_2_variables': 'dataframe',
+    'graph_3_variables': 'dataframe',
+    'graph_mulitple_scenarios_2_variables': 'dataframes',
+    'graph_mulitple_scenarios_3_variables': 'dataframes'}
+
+# Functions preparing the data of every graph function, drawing the prepared
+# data, and the names of the prepared data in the drawing function
+PREPARED_FUNCTIONS = {
+    'stacked_bar_graph': (functions.stacked_bar_data,
+                          functions.draw_stacked_bar_graph,
+                          ('df_to_analyze', 'data_to_plot')),
+    'graph_2_variables': (functions.graph_2_variables_data,
+                          functions.draw_graph,
+                          ('df_to_plot', 'legend', 'marker_frames')),
+    'graph_3_variables': (functions.graph_3_variables_data,
+                          functions.draw_graph,
+                          ('df_to_plot', 'legend', 'marker_frames')),
+    'graph_mulitple_scenarios_2_variables': (
+        functions.graph_mulitple_scenarios_2_variables_data,
+        functions.draw_graph, ('df_to_plot', 'legend', 'marker_frames')),
+    'graph_mulitple_scenarios_3_variables': (
+        functions.graph_mulitple_scenarios_3_variables_data,
+        functions.draw_graph, ('df_to_plot', 'legend', 'marker_frames'))}
+
+CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml',
+                 'pdf': 'application/pdf'}
+
+
+class RequestError(ValueError):
+    """Invalid render request, sent back to the client."""
+
+
+class RenderServer:
+    """
+    Keep the symbols loaded and render the requested graphs with a bounded
+    number of workers. Requests above max_workers + max_queue are refused
+    instead of waiting. The data prepared for the last max_prepared graphs
+    are also kept, so that a graph requested again with other colors,
+    labels, format, etc. is only drawn.
+
+    """
+
+    def __init__(self, symbols=None, loader=None, max_workers=2,
+                 max_queue=8, max_prepared=32):
+        self.symbols = dict(symbols or {})
+        self.loader = loader
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.slots = threading.BoundedSemaphore(max_workers + max_queue)
+        self.lock = threading.Lock()
+        self.symbol_locks = {}
+        self.prepared = OrderedDict()
+        self.max_prepared = max_prepared
+
+    def get_symbol(self, name):
+        """
+        Loaded DataFrame(s) of the symbol, loaded on first use. The other
+        symbols stay available while a symbol is loading.
+
+        """
+
+        with self.lock:
+            if name in self.symbols:
+                return self.symbols[name]
+            if self.loader is None:
+                raise RequestError(str(name) + ' is not a loaded symbol.')
+            symbol_lock = self.symbol_locks.setdefault(name, threading.Lock())
+        with symbol_lock:  # Only the requests of this symbol wait
+            with self.lock:
+                if name in self.symbols:
+                    return self.symbols[name]
+            symbol = self.loader(name)
+            with self.lock:
+                self.symbols[name] = symbol
+            return symbol
+
+    def get_prepared(self, function_name, request, arguments):
+        """
+        Data prepared by the data function of the graph, kept for the next
+        requests with the same symbol and the same arguments of the data
+        function.
+
+        """
+
+        data_function = PREPARED_FUNCTIONS[function_name][0]
+        parameters = inspect.signature(data_function).parameters
+        data_arguments = {key: value for key, value in arguments.items()
+                          if key in parameters}
+        if 'markers' in parameters:  # Same as in the graph functions
+            data_arguments['markers'] = bool(arguments['marker_dict'] and
+                                             arguments['kind'] == 'line')
+        # The arguments of the request are still in JSON, simple to compare
+        request_arguments = {name: value for name, value
+                             in request.get('args', {}).items()
+                             if name in parameters}
+        key = (function_name, request.get('data'),
+               data_arguments.get('markers'),
+               json.dumps(request_arguments, sort_keys=True))
+
+        with self.lock:
+            if key in self.prepared:
+                self.prepared.move_to_end(key)
+                return self.prepared[key]
+        prepared = data_function(**data_arguments)
+        with self.lock:
+            self.prepared[key] = prepared
+            if len(self.prepared) > self.max_prepared:
+                self.prepared.popitem(last=False)
+        return prepared
+
+    def submit(self, request):
+        """
+        Render the request in the worker pool.
+
+        Returns
+        -------
+        bytes
+            FILE OF THE GRAPH, OR None IF THE QUEUE IS FULL.
+
+        """
+
+        if not self.slots.acquire(blocking=False):
+            return None
+        try:
+            return self.executor.submit(self.render, request).result()
+        finally:
+            self.slots.release()
+
+    def render(self, request):
+        """Draw the graph of the request and return the file as bytes."""
+        if not isinstance(request, dict):
+            raise RequestError('The request has to be a JSON object.')
+        function_name = request.get('function')
+        if function_name not in GRAPH_FUNCTIONS:
+            raise RequestError(str(function_name) + ' is not one of: ' +
+                               ', '.join(GRAPH_FUNCTIONS))
+        file_format = request.get('format', 'png')
+        if file_format not in CONTENT_TYPES:
+            raise RequestError(file_format + ' is not one of: ' +
+                               ', '.join(CONTENT_TYPES))
+
+        if not isinstance(request.get('args', {}), dict):
+            raise RequestError('The args have to be a JSON object.')
+        kwargs = {key: from_json(value)
+                  for key, value in request.get('args', {}).items()}
+        kwargs[GRAPH_FUNCTIONS[function_name]] = \
+            self.get_symbol(request.get('data'))
+
+        graph_function = getattr(functions, function_name)
+        try:
+            arguments = inspect.signature(graph_function).bind(ax=None,
+                                                               **kwargs)
+        except TypeError as error:
+            raise RequestError(function_name + ': ' + str(error))
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+
+        prepared = self.get_prepared(function_name, request, arguments)
+        draw_function, names = PREPARED_FUNCTIONS[function_name][1:]
+        parameters = inspect.signature(draw_function).parameters
+        draw_arguments = {key: value for key, value in arguments.items()
+                          if key in parameters and key != 'ax'}
+        draw_arguments.update(zip(names, prepared))
+        return functions.graph_to_bytes(
+            functools.partial(draw_function, **draw_arguments), file_format,
+            request.get('figsize'), request.get('dpi'))
+
+    def close(self):
+        """Wait for the running requests and stop the workers."""
+        self.executor.shutdown(wait=True)
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """POST /render with a JSON request, answers with the graph file."""
+
+    def do_POST(self):
+        if self.path != '/render':
+            self.send_text(404, 'Unknown path ' + self.path)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            content = self.server.render_server.submit(request)
+        except (RequestError, ValueError, KeyError, TypeError) as error:
+            self.send_text(400, type(error).__name__ + ': ' + str(error))
+            return
+        except Exception as error:
+            self.send_text(500, type(error).__name__ + ': ' + str(error))
+            return
+        if content is None:
+            self.send_text(503, 'Too many requests, try again later.')
+            return
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         CONTENT_TYPES[request.get('format', 'png')])
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def send_text(self, status, text):
+        content = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def address_string(self):
+        # No client address on a Unix socket
+        if not self.client_address:
+            return 'unix socket'
+        return super().address_string()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn,
+                     socketserver.UnixStreamServer):
+    """HTTP server on a Unix socket."""
+
+    daemon_threads = True
+
+
+def make_server(render_server, port=0, unix_socket=False, verbose=False):
+    """
+    Create the HTTP server of the render_server, on localhost or on a Unix
+    socket. Use serve_forever() to start it and shutdown() to stop it.
+
+    Parameters
+    ----------
+    render_server : RenderServer
+        SERVER KEEPING THE SYMBOLS LOADED.
+    port : int, optional
+        PORT ON LOCALHOST. THE DEFAULT 0 CHOOSES A FREE PORT, AVAILABLE IN
+        server.server_address.
+    unix_socket : str, optional
+        PATH OF THE UNIX SOCKET TO USE INSTEAD OF localhost.
+    verbose : bool, optional
+        USE IF YOU WANT EVERY REQUEST TO BE DISPLAYED.
+
+    Returns
+    -------
+    server : socketserver.BaseServer
+        HTTP SERVER.
+
+    """
+
+    if unix_socket:
+        remove_stale_socket(unix_socket)
+        server = UnixHTTPServer(unix_socket, RenderRequestHandler)
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port),
+                                     RenderRequestHandler)
+    server.render_server = render_server
+    server.verbose = verbose
+    return server
+
+
+def remove_stale_socket(unix_socket):
+    """
+    Remove the socket file left by a server that was stopped, so that a new
+    server can use the same path. A socket with a server still listening is
+    kept.
+
+    """
+
+    if not os.path.exists(unix_socket):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(unix_socket)
+        except ConnectionRefusedError:
+            os.unlink(unix_socket)
+        except OSError:  # Not a socket, the error is raised by bind
+            pass
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection on a Unix socket."""
+
+    def __init__(self, unix_socket, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_socket = unix_socket
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+def render(function, data, args, file_format='png', port=8765,
+           unix_socket=False, figsize=None, dpi=None, timeout=None):
+    """
+    Client of the render server.
+
+    Parameters
+    ----------
+    function : str
+        NAME OF THE GRAPH FUNCTION, FOR EXAMPLE graph_2_variables.
+    data : str
+        NAME OF THE SYMBOL LOADED IN THE SERVER.
+    args : dict
+        OTHER ARGUMENTS OF THE GRAPH FUNCTION, WITHOUT ax AND THE DATA.
+    file_format : str, optional
+        EITHER png, svg OR pdf. The default is 'png'.
+    port : int, optional
+        PORT OF THE SERVER ON localhost. The default is 8765.
+    unix_socket : str, optional
+        PATH OF THE UNIX SOCKET OF THE SERVER, INSTEAD OF port.
+    figsize : tuple, optional
+        SIZE OF THE FIGURE. THE FORMAT IS (WIDTH, HEIGHT).
+    dpi : float, optional
+        RESOLUTION OF THE FIGURE.
+    timeout : float, optional
+        TIME IN SECONDS TO WAIT FOR THE SERVER.
+
+    Returns
+    -------
+    bytes
+        FILE OF THE GRAPH. RAISES A RuntimeError WITH THE MESSAGE OF THE
+        SERVER IF THE GRAPH CAN'T BE RENDERED.
+
+    """
+
+    request = {'function': function, 'data': data,
+               'args': {key: to_json(value) for key, value in args.items()},
+               'format': file_format, 'figsize': figsize, 'dpi': dpi}
+    body = json.dumps(request).encode('utf-8')
+    if unix_socket:
+        connection = UnixHTTPConnection(unix_socket, timeout=timeout)
+    else:
+        connection = http.client.HTTPConnection('127.0.0.1', port,
+                                                timeout=timeout)
+    try:
+        connection.request('POST', '/render', body,
+                           {'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        content = response.read()
+    finally:
+        connection.close()
+    if response.status != 200:
+        raise RuntimeError(str(response.status) + ' ' +
+                           content.decode('utf-8', 'replace'))
+    return content
+
+
+def to_json(value):
+    """
+    Encode the dictionaries with tuple keys (such as the color_dict of the
+    multiple scenarios functions), which JSON does not support.
+
+    """
+
+    if isinstance(value, dict) and any(isinstance(key, tuple)
+                                       for key in value):
+        return {'__items__': [[list(key) if isinstance(key, tuple) else key,
+                               to_json(item)]
+                              for key, item in value.items()]}
+    if isinstance(value, dict):
+        return {key: to_json(item) for key, item in value.items()}
+    return value
+
+
+def from_json(value):
+    """Decode the dictionaries encoded by to_json."""
+    if isinstance(value, dict) and set(value) == {'__items__'}:
+        return {tuple(key) if isinstance(key, list) else key: from_json(item)
+                for key, item in value['__items__']}
+    if isinstance(value, dict):
+        return {key: from_json(item) for key, item in value.items()}
+    return value
+
+
+def gdx_loader(gdx_files):
+    """
+    Loader of the symbols of GDX files, one DataFrame per file in the same
+    order as gdx_files.
+
+    """
+
+    def loader(name):
+        dataframes = []
+        for files in gdx_files:
+            try:
+                dataframes.append(files[name].records)
+            except (KeyError, AttributeError):
+                raise RequestError(name + ' is not in one of the gdx file.')
+        return dataframes
+
+    return loader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix-socket', default=False)
+    parser.add_argument('--gdx', nargs='+', default=[],
+                        help='GDX files, one per scenario')
+    parser.add_argument('--system-directory', default=None,
+                        help='GAMS system directory')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--queue', type=int, default=8)
+    parser.add_argument('--prepared', type=int, default=32,
+                        help='number of prepared graphs kept in memory')
+    parser.add_argument('--verbose', action='store_true')
+    options = parser.parse_args()
+
+    loader = None
+    if options.gdx:
+        import gams.transfer as gt
+        gdx_files = [gt.Container(load_from=path,
+                                  system_directory=options.system_directory)
+                     for path in options.gdx]
+        loader = gdx_loader(gdx_files)
+
+    render_server = RenderServer(loader=loader, max_workers=options.workers,
+                                 max_queue=options.queue,
+                                 max_prepared=options.prepared)
+    server = make_server(render_server, options.port, options.unix_socket,
+                         options.verbose)
+    print('Render server listening on ' + str(server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        render_server.close()
+        if options.unix_socket:
+            os.unlink(options.unix_socket)
+
+
+if __name__ == '__main__':
+    main()
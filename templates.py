@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Figure templates to export many graphs with the same layout.
+
+The figure, the axes and their styling are created once, then every new
+dataset only replaces the data of the graph:
+
+    template = templates.FigureTemplate(functions.graph_2_variables,
+                                        style=style_function, kind='line',
+                                        x_var=x_var, y_var=y_var, ...)
+    for name, df in dataframes.items():
+        template.update(dataframe=df)
+        template.savefig(name + '.png')
+
+For line graphs with the same columns and years as the previous dataset, and
+the same colors, styles, markers, etc., the lines and markers already drawn
+are updated in place. Otherwise, the data of the previous graph are removed
+and the prepared data are drawn again on the same axes.
+"""
+
+import inspect
+
+import numpy as np
+from matplotlib.figure import Figure
+
+import functions
+
+# Functions preparing the data of the graph functions, without plotting
+DATA_FUNCTIONS = {
+    functions.graph_2_variables: functions.graph_2_variables_data,
+    functions.graph_3_variables: functions.graph_3_variables_data,
+    functions.graph_mulitple_scenarios_2_variables:
+        functions.graph_mulitple_scenarios_2_variables_data,
+    functions.graph_mulitple_scenarios_3_variables:
+        functions.graph_mulitple_scenarios_3_variables_data}
+
+
+class FigureTemplate:
+    """
+    Figure reused for successive datasets of the same graph function.
+
+    Parameters
+    ----------
+    graph_function : function
+        ONE OF THE GRAPH FUNCTIONS OF THE functions MODULE.
+    figsize : tuple, optional
+        SIZE OF THE FIGURE. THE FORMAT IS (WIDTH, HEIGHT).
+    dpi : float, optional
+        RESOLUTION OF THE FIGURE.
+    style : function, optional
+        FUNCTION CALLED ONCE WITH THE ax TO ADD THE TITLES, THE GRID, ETC.
+    **kwargs
+        ARGUMENTS OF THE graph_function THAT ARE THE SAME FOR ALL THE
+        DATASETS, WITHOUT ax.
+
+    """
+
+    def __init__(self, graph_function, figsize=None, dpi=None, style=None,
+                 **kwargs):
+        self.graph_function = graph_function
+        self.kwargs = kwargs
+        self.fig = Figure(figsize=figsize, dpi=dpi)
+        self.ax = self.fig.add_subplot()
+        if style:
+            style(self.ax)
+        # Everything added to the axes after the styling is data
+        self.template_artists = set(self.ax.get_children())
+        self.template_containers = list(self.ax.containers)
+        # The graph functions can also change the labels and the ticks
+        self.template_axis = [
+            (axis, axis.get_label_text(), axis.get_major_locator(),
+             axis.get_major_formatter(), axis.get_minor_locator(),
+             axis.get_minor_formatter())
+            for axis in [self.ax.xaxis, self.ax.yaxis]]
+        self.df_to_plot = None
+        self.legend = None
+        self.draw_arguments = None
+        self.lines = []
+        self.markers = []
+
+    def update(self, **kwargs):
+        """
+        Replace the data of the graph.
+
+        Parameters
+        ----------
+        **kwargs
+            ARGUMENTS OF THE graph_function THAT CHANGE FOR THIS DATASET,
+            USUALLY dataframe OR dataframes.
+
+        Returns
+        -------
+        RESULT OF THE graph_function, USUALLY df_to_plot.
+
+        """
+
+        arguments = dict(self.kwargs, **kwargs)
+        if self.graph_function not in DATA_FUNCTIONS:
+            self._remove_data()
+            return self.graph_function(ax=self.ax, **arguments)
+
+        # Same arguments as in the graph_function, with the default values
+        arguments = inspect.signature(self.graph_function).bind(
+            ax=self.ax, **arguments)
+        arguments.apply_defaults()
+        arguments = arguments.arguments
+        data_function = DATA_FUNCTIONS[self.graph_function]
+        parameters = inspect.signature(data_function).parameters
+        prepared = data_function(
+            **{key: value for key, value in arguments.items()
+               if key in parameters},
+            markers=bool(arguments['marker_dict'] and
+                         arguments['kind'] == 'line'))
+        # Arguments of the drawing, compared with the ones of the last graph
+        parameters = inspect.signature(functions.draw_graph).parameters
+        draw_arguments = {key: value for key, value in arguments.items()
+                          if key in parameters and key != 'ax'}
+
+        if not self._update_lines(prepared, draw_arguments):
+            self._remove_data()
+            functions.draw_graph(ax=self.ax, df_to_plot=prepared[0],
+                                 legend=prepared[1],
+                                 marker_frames=prepared[2],
+                                 **draw_arguments)
+            self._keep_data(prepared, draw_arguments)
+
+        if draw_arguments['return_legend']:
+            return self.df_to_plot, self.legend
+        return self.df_to_plot
+
+    def savefig(self, fname, **kwargs):
+        """Save the figure, see matplotlib.figure.Figure.savefig."""
+        self.fig.savefig(fname, **kwargs)
+
+    def _update_lines(self, prepared, draw_arguments):
+        """
+        Update the lines in place if the new data have the same shape and
+        are drawn with the same arguments.
+
+        """
+
+        df_to_plot, legend, marker_frames = prepared
+        if (self.df_to_plot is None or draw_arguments['kind'] != 'line' or
+                draw_arguments != self.draw_arguments):
+            return False
+        if not (df_to_plot.columns.equals(self.df_to_plot.columns) and
+                df_to_plot.index.equals(self.df_to_plot.index) and
+                legend == self.legend and
+                len(marker_frames) == len(self.markers)):
+            return False
+
+        for line, column in zip(self.lines, df_to_plot.columns):
+            line.set_ydata(df_to_plot[column].to_numpy())
+        x_var = draw_arguments['x_var']
+        for marker, df in zip(self.markers, marker_frames.values()):
+            values = 'value' if 'value' in df.columns else 'level'
+            marker.set_offsets(np.column_stack([df[x_var].to_numpy(),
+                                                df[values].to_numpy()]))
+        self.ax.relim()
+        self.ax.autoscale_view()
+        self.df_to_plot = df_to_plot
+        return True
+
+    def _remove_data(self):
+        """Remove the data of the previous graph, keep the styling."""
+        for container in self.ax.containers[:]:
+            if container not in self.template_containers:
+                container.remove()
+        for artist in self.ax.get_children():
+            if artist not in self.template_artists:
+                artist.remove()
+        for (axis, label, major_locator, major_formatter, minor_locator,
+             minor_formatter) in self.template_axis:
+            axis.set_label_text(label)
+            axis.set_major_locator(major_locator)
+            axis.set_major_formatter(major_formatter)
+            axis.set_minor_locator(minor_locator)
+            axis.set_minor_formatter(minor_formatter)
+        self.ax.relim()
+        self.ax.set_autoscale_on(True)
+        self.df_to_plot = None
+        self.legend = None
+        self.draw_arguments = None
+        self.lines = []
+        self.markers = []
+
+    def _keep_data(self, prepared, draw_arguments):
+        """Keep the data and the artists to update them in place."""
+        self.df_to_plot, self.legend = prepared[:2]
+        self.draw_arguments = draw_arguments
+        self.lines = [line for line in self.ax.lines
+                      if line not in self.template_artists]
+        self.markers = [collection for collection in self.ax.collections
+                        if collection not in self.template_artists]